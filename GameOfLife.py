@@ -6,16 +6,148 @@ Notes:
     Only tested on Linux (Ubuntu GNOME 16.10)
     Probably will not work on Windows
 '''
+import functools
 import math
-import random
-import hashlib
+import multiprocessing
 import os
 import sys
 
+from multiprocessing import shared_memory
 from time import sleep
 
+import numpy as np
+
+try:
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import cupy
+except ImportError:
+    cupy = None
+
 debug = False
 
+
+def _build_rule_lut():
+    ''' The transition is a pure function of 9 bits (the cell and its
+        8 neighbors), so tabulate all 512 outcomes once. Bit k of the
+        index is the k-th cell of the 3x3 window in row-major order;
+        bit 4 is the cell itself '''
+    lut = np.zeros(512, dtype=np.uint8)
+    for i in range(512):
+        bits = [(i >> k) & 1 for k in range(9)]
+        alive = bits[4]
+        s = sum(bits) - alive
+        lut[i] = 1 if s == 3 or (alive and s == 2) else 0
+    return lut
+
+_RULE_LUT = _build_rule_lut()
+
+# the 8 neighbor offsets of a cell, as (dy, dx)
+_OFFSETS_8 = tuple((dy, dx)
+                   for dy in (-1, 0, 1)
+                   for dx in (-1, 0, 1)
+                   if (dy, dx) != (0, 0))
+
+
+if numba is not None:
+    @numba.njit(numba.void(numba.uint8[:, ::1], numba.uint8[:, ::1],
+                           numba.uint8[::1]),
+                parallel=True, cache=True, boundscheck=False)
+    def _step_jit(padded, out, lut):
+        ''' One generation over a grid padded with a 1-cell dead border.
+            Reads the padded grid, writes the unpadded result into out.
+            Each cell gathers its 3x3 window into a 9-bit index and the
+            outcome is a single lookup in the 512-entry rule table.
+            Rows are independent, so they are split across cores.
+
+            The explicit C-contiguous signature compiles the kernel
+            eagerly: combined with cache=True, later runs load the
+            compiled object from disk instead of paying JIT warmup on
+            the first generation, and the known layout gives the
+            compiler tighter codegen in the inner loop '''
+        h, w = out.shape
+        for y in numba.prange(h):
+            for x in range(w):
+                idx = (padded[y, x]
+                       | padded[y, x + 1] << 1
+                       | padded[y, x + 2] << 2
+                       | padded[y + 1, x] << 3
+                       | padded[y + 1, x + 1] << 4
+                       | padded[y + 1, x + 2] << 5
+                       | padded[y + 2, x] << 6
+                       | padded[y + 2, x + 1] << 7
+                       | padded[y + 2, x + 2] << 8)
+                out[y, x] = lut[idx]
+
+    @numba.njit(cache=True, boundscheck=False)
+    def _step_swar(packed, out, last_mask):
+        ''' One generation over a bit-packed grid: 64 cells per uint64
+            word, bit j of word w holding cell x = 64*w + j.
+
+            Horizontal neighbor sums are computed 64 cells at a time
+            with a bitwise full adder over the left-shifted, unshifted
+            and right-shifted rows (carrying the edge bit across word
+            boundaries). Vertical summing adds the three per-row 2-bit
+            counts into 4-bit lanes, and the rule falls out as a pair of
+            bitmask compares: with S the 3x3 sum including the center,
+            the cell lives iff S == 3 or (it was alive and S == 4).
+
+            Bits past the board width in the last word are cleared with
+            last_mask so ghost cells never appear '''
+        h, words = packed.shape
+
+        # per-row 2-bit horizontal sums: row + left-shifted + right-shifted
+        ones = np.empty((h, words), np.uint64)
+        twos = np.empty((h, words), np.uint64)
+        for y in range(h):
+            for w in range(words):
+                b = packed[y, w]
+                left = b << 1
+                if w > 0:
+                    left |= packed[y, w - 1] >> 63
+                right = b >> 1
+                if w + 1 < words:
+                    right |= packed[y, w + 1] << 63
+                ones[y, w] = left ^ b ^ right
+                twos[y, w] = (left & b) | ((left ^ b) & right)
+
+        zero = np.uint64(0)
+        for y in range(h):
+            for w in range(words):
+                o1 = ones[y - 1, w] if y > 0 else zero
+                t1 = twos[y - 1, w] if y > 0 else zero
+                o2 = ones[y, w]
+                t2 = twos[y, w]
+                o3 = ones[y + 1, w] if y + 1 < h else zero
+                t3 = twos[y + 1, w] if y + 1 < h else zero
+
+                # add three 2-bit numbers into bits s0..s3 (S = 0..9)
+                b0 = o1 ^ o2
+                c0 = o1 & o2
+                b1 = t1 ^ t2 ^ c0
+                c1 = (t1 & t2) | (c0 & (t1 ^ t2))
+                s0 = b0 ^ o3
+                c2 = b0 & o3
+                s1 = b1 ^ t3 ^ c2
+                c3 = (b1 & t3) | (c2 & (b1 ^ t3))
+                s2 = c1 ^ c3
+                s3 = c1 & c3
+
+                eq3 = s0 & s1 & ~s2 & ~s3
+                eq4 = ~s0 & ~s1 & s2 & ~s3
+                res = eq3 | (packed[y, w] & eq4)
+                if w == words - 1:
+                    res &= last_mask
+                out[y, w] = res
+
 class bcolors:
     HEADER = '\033[95m'
     OKBLUE = '\033[94m'
@@ -26,6 +158,9 @@ class bcolors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+# rendered form of a dead and a live cell, indexable by the grid itself
+_CELL_CHARS = np.array([" ", bcolors.OKGREEN + "*" + bcolors.ENDC])
+
 class Point:
     def __init__(self, x=0, y=0):
         self.x = x
@@ -41,185 +176,741 @@ class Point:
 class Cell(Point):
     def __init__(self, x=0, y=0, alive=False):
         self.alive = alive
-        self.will_die = False
-        self.will_revive = False
         Point.__init__(self, x, y)
 
-    def revive(self):
-        self.alive = True
-        self.will_die = False
-        self.will_revive = False
-
-    def kill(self):
-        self.alive = False
-        self.will_die = False
-        self.will_revive = False
-
     def __repr__(self):
         if self.alive:
             return bcolors.OKGREEN + "*" + bcolors.ENDC
         else:
             return " "
-class Iter:
-    def __init__(self, begin=0, end=0):
-        if begin > end:
-            raise ValueError("Iter: begin cannot be greater than end\n" + 
-                    "begin = " + str(begin) + "end = " + str(end))
 
-        else:
-            self.begin = begin
-            self.end   = end
 
-    def __repr__(self):
-        return str((begin, end))
+# --- GPU --------------------------------------------------------------
+#
+# One thread per cell. Each 16x16 block stages its tile plus a 1-cell
+# halo in shared memory, so every cell of the input is read from global
+# memory once per block instead of up to 9 times.
+
+_GPU_SRC = r'''
+extern "C" __global__
+void gol_step(const unsigned char *in, unsigned char *out,
+              const int h, const int w)
+{
+    __shared__ unsigned char tile[18][18];
+
+    const int tx = threadIdx.x;
+    const int ty = threadIdx.y;
+    const int x = blockIdx.x * 16 + tx;
+    const int y = blockIdx.y * 16 + ty;
+
+    /* stage the tile and its halo; out-of-range cells are dead */
+    for (int i = ty; i < 18; i += 16) {
+        for (int j = tx; j < 18; j += 16) {
+            const int gy = blockIdx.y * 16 + i - 1;
+            const int gx = blockIdx.x * 16 + j - 1;
+            tile[i][j] = (gy >= 0 && gy < h && gx >= 0 && gx < w)
+                             ? in[gy * w + gx] : 0;
+        }
+    }
+    __syncthreads();
+
+    if (x >= w || y >= h)
+        return;
+
+    const int s = tile[ty][tx]     + tile[ty][tx + 1]     + tile[ty][tx + 2]
+                + tile[ty + 1][tx]                        + tile[ty + 1][tx + 2]
+                + tile[ty + 2][tx] + tile[ty + 2][tx + 1] + tile[ty + 2][tx + 2];
+    out[y * w + x] = (s == 3 || (tile[ty + 1][tx + 1] && s == 2)) ? 1 : 0;
+}
+'''
+
+if cupy is not None:
+    _gpu_step = cupy.RawKernel(_GPU_SRC, 'gol_step')
+
+
+# --- Multiprocessing --------------------------------------------------
+#
+# The transition is embarrassingly parallel in space: split the grid
+# into horizontal row bands and let each worker compute its band of the
+# next generation. Both generations live in shared memory, so workers
+# read the halo rows of their neighbors directly and write their band
+# without any copying or locking (each output row has exactly one
+# writer).
+
+_mp_views = None
+_mp_shms = None
+
+def _mp_init(name_a, name_b, shape):
+    ''' Pool initializer: attach the two shared grid buffers '''
+    global _mp_views, _mp_shms
+    shm_a = shared_memory.SharedMemory(name=name_a)
+    shm_b = shared_memory.SharedMemory(name=name_b)
+    _mp_shms = (shm_a, shm_b)
+    _mp_views = (np.ndarray(shape, dtype=np.uint8, buffer=shm_a.buf),
+                 np.ndarray(shape, dtype=np.uint8, buffer=shm_b.buf))
+
+def _mp_step_band(args):
+    ''' Computes rows [y0, y1) of the next generation. flip selects
+        which shared buffer is the source, so the two can ping-pong
+        between ticks without a copy '''
+    y0, y1, flip = args
+    src = _mp_views[flip]
+    dst = _mp_views[1 - flip]
+    h, w = src.shape
+    bh = y1 - y0
+
+    # band plus its one-row halos, padded with a dead border
+    padded = np.zeros((bh + 2, w + 2), dtype=np.uint8)
+    lo = max(y0 - 1, 0)
+    hi = min(y1 + 1, h)
+    padded[lo - y0 + 1:hi - y0 + 1, 1:-1] = src[lo:hi]
+
+    n = sum(padded[dy:dy + bh, dx:dx + w]
+            for dy in range(3)
+            for dx in range(3)
+            if (dy, dx) != (1, 1))
+    band = src[y0:y1]
+    dst[y0:y1] = ((n == 3) | ((band == 1) & (n == 2)))
+
+
+# --- HashLife ---------------------------------------------------------
+#
+# The board is represented as a quadtree: a level-k node covers a
+# 2^k x 2^k square, with four level-(k-1) children. Nodes are
+# canonicalized (interned), so identical regions are the same object,
+# and the evolution of each node is memoized: a level-k node "knows"
+# its center 2^(k-1) square up to 2^(k-2) generations into the future.
+# Repetitive patterns evolve in logarithmic rather than linear time.
+
+class _HLNode:
+    ''' Canonical quadtree node. level-0 nodes are the two cell
+        leaves; higher nodes hold four children one level down.
+        Nodes are interned through _hl_join, so identity comparison
+        and the default id-based hash are enough for memoization '''
+    __slots__ = ('level', 'pop', 'nw', 'ne', 'sw', 'se')
+
+    def __init__(self, level, pop, nw, ne, sw, se):
+        self.level = level
+        self.pop = pop
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+
+_HL_OFF = _HLNode(0, 0, None, None, None, None)
+_HL_ON = _HLNode(0, 1, None, None, None, None)
+
+_HL_NODES = {}
+_HL_EMPTY = {}
+_HL_LUT = None
+
+def _hl_join(nw, ne, sw, se):
+    ''' Returns the canonical node with the given children '''
+    key = (nw, ne, sw, se)
+    node = _HL_NODES.get(key)
+    if node is None:
+        node = _HLNode(nw.level + 1, nw.pop + ne.pop + sw.pop + se.pop,
+                       nw, ne, sw, se)
+        _HL_NODES[key] = node
+    return node
+
+def _hl_empty(level):
+    ''' Returns the canonical all-dead node of the given level '''
+    node = _HL_EMPTY.get(level)
+    if node is None:
+        if level == 0:
+            node = _HL_OFF
+        else:
+            sub = _hl_empty(level - 1)
+            node = _hl_join(sub, sub, sub, sub)
+        _HL_EMPTY[level] = node
+    return node
+
+def _hl_centre(node):
+    ''' Embeds node in the center of an empty node one level up '''
+    e = _hl_empty(node.level - 1)
+    return _hl_join(_hl_join(e, e, e, node.nw),
+                    _hl_join(e, e, node.ne, e),
+                    _hl_join(e, node.sw, e, e),
+                    _hl_join(node.se, e, e, e))
+
+def _hl_is_padded(node):
+    ''' True if all live cells sit in the center quarter of the node,
+        leaving a border wide enough that nothing can escape (or be
+        influenced from outside) during one full-speed advance '''
+    return (node.level >= 3
+            and node.nw.pop == node.nw.se.se.pop
+            and node.ne.pop == node.ne.sw.sw.pop
+            and node.sw.pop == node.sw.ne.ne.pop
+            and node.se.pop == node.se.nw.nw.pop)
+
+def _hl_build_lut():
+    ''' Brute-force table of all 65536 4x4 neighborhoods: entry i holds
+        the center 2x2 after one generation, as 4 bits (nw, ne, sw, se).
+        Bit j of i is the cell at (row j // 4, col j % 4) '''
+    idx = np.arange(65536, dtype=np.uint32)
+    bits = ((idx[:, None] >> np.arange(16, dtype=np.uint32)) & 1) \
+               .astype(np.uint8).reshape(-1, 4, 4)
+
+    padded = np.zeros((65536, 6, 6), dtype=np.uint8)
+    padded[:, 1:5, 1:5] = bits
+    n = sum(padded[:, dy:dy + 4, dx:dx + 4]
+            for dy in range(3)
+            for dx in range(3)
+            if (dy, dx) != (1, 1))
+    nxt = ((n == 3) | ((bits == 1) & (n == 2)))
+
+    centre = nxt[:, 1:3, 1:3]
+    return (centre[:, 0, 0]
+            | centre[:, 0, 1] << 1
+            | centre[:, 1, 0] << 2
+            | centre[:, 1, 1] << 3).astype(np.uint8)
+
+def _hl_life_4x4(node):
+    ''' One generation of a level-2 (4x4) node via the lookup table,
+        returning its center 2x2 as a level-1 node '''
+    global _HL_LUT
+    if _HL_LUT is None:
+        _HL_LUT = _hl_build_lut()
+
+    cells = (node.nw.nw, node.nw.ne, node.ne.nw, node.ne.ne,
+             node.nw.sw, node.nw.se, node.ne.sw, node.ne.se,
+             node.sw.nw, node.sw.ne, node.se.nw, node.se.ne,
+             node.sw.sw, node.sw.se, node.se.sw, node.se.se)
+    idx = 0
+    for i, c in enumerate(cells):
+        idx |= c.pop << i
+
+    out = int(_HL_LUT[idx])
+    leaf = (_HL_OFF, _HL_ON)
+    return _hl_join(leaf[out & 1], leaf[(out >> 1) & 1],
+                    leaf[(out >> 2) & 1], leaf[(out >> 3) & 1])
+
+@functools.lru_cache(maxsize=None)
+def _hl_successor(node, j):
+    ''' The center half of node advanced min(2^j, 2^(level-2))
+        generations. This is the memoized heart of HashLife: because
+        nodes are canonical, every repeated region at every scale hits
+        the cache instead of being recomputed '''
+    if node.pop == 0:
+        return _hl_empty(node.level - 1)
+    if node.level == 2:
+        return _hl_life_4x4(node)
+    j = min(j, node.level - 2)
+
+    nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+
+    # advance the nine overlapping half-size squares
+    c1 = _hl_successor(nw, j)
+    c2 = _hl_successor(_hl_join(nw.ne, ne.nw, nw.se, ne.sw), j)
+    c3 = _hl_successor(ne, j)
+    c4 = _hl_successor(_hl_join(nw.sw, nw.se, sw.nw, sw.ne), j)
+    c5 = _hl_successor(_hl_join(nw.se, ne.sw, sw.ne, se.nw), j)
+    c6 = _hl_successor(_hl_join(ne.sw, ne.se, se.nw, se.ne), j)
+    c7 = _hl_successor(sw, j)
+    c8 = _hl_successor(_hl_join(sw.ne, se.nw, sw.se, se.sw), j)
+    c9 = _hl_successor(se, j)
+
+    if j < node.level - 2:
+        # partial advance: the nine are already at time 2^j, so just
+        # assemble the center from their middles
+        return _hl_join(_hl_join(c1.se, c2.sw, c4.ne, c5.nw),
+                        _hl_join(c2.se, c3.sw, c5.ne, c6.nw),
+                        _hl_join(c4.se, c5.sw, c7.ne, c8.nw),
+                        _hl_join(c5.se, c6.sw, c8.ne, c9.nw))
+
+    # full-speed advance: recurse once more for another 2^(level-3)
+    return _hl_join(_hl_successor(_hl_join(c1, c2, c4, c5), j),
+                    _hl_successor(_hl_join(c2, c3, c5, c6), j),
+                    _hl_successor(_hl_join(c4, c5, c7, c8), j),
+                    _hl_successor(_hl_join(c5, c6, c8, c9), j))
+
+def _hl_from_grid(grid):
+    ''' Builds a quadtree from a uint8 grid, placed at the node's
+        top-left corner '''
+    h, w = grid.shape
+    size = 4
+    while size < max(h, w):
+        size *= 2
+
+    padded = np.zeros((size, size), dtype=np.uint8)
+    padded[:h, :w] = grid
+
+    def build(y0, x0, s):
+        if s == 1:
+            return _HL_ON if padded[y0, x0] else _HL_OFF
+        half = s // 2
+        return _hl_join(build(y0, x0, half),
+                        build(y0, x0 + half, half),
+                        build(y0 + half, x0, half),
+                        build(y0 + half, x0 + half, half))
+
+    return build(0, 0, size)
+
+def _hl_to_grid(node, grid, y0, x0):
+    ''' Writes the live cells of node into grid, with the node's
+        top-left corner at (y0, x0); cells outside grid are clipped '''
+    if node.pop == 0:
+        return
+    if node.level == 0:
+        if 0 <= y0 < grid.shape[0] and 0 <= x0 < grid.shape[1]:
+            grid[y0, x0] = 1
+        return
+    size = 1 << node.level
+    if y0 >= grid.shape[0] or x0 >= grid.shape[1] \
+            or y0 + size <= 0 or x0 + size <= 0:
+        return
+    half = size // 2
+    _hl_to_grid(node.nw, grid, y0, x0)
+    _hl_to_grid(node.ne, grid, y0, x0 + half)
+    _hl_to_grid(node.sw, grid, y0 + half, x0)
+    _hl_to_grid(node.se, grid, y0 + half, x0 + half)
 
 
 class Board:
 
-    def __init__(self, width=0, height=0):
+    def __init__(self, width=0, height=0, processes=None, wrap=False):
         if width < 0 or height < 0:
             raise ValueError("Dimensions cannot be negative")
 
         else:
-            self.board = []
             self.width = width
             self.height = height
-            for i in range(self.height):
-                tmp_l = []
-                for j in range(self.width):
-                    tmp_l.append(Cell())
-                self.board.append(tmp_l)
 
-    def __repr__(self):
-        ret_s = ""
-
-        # Draw top bar
-        for j in range(self.width):
-            ret_s += '--'
-        ret_s += '\n' 
+            # One byte per cell: 1 = alive, 0 = dead. Keeping the whole
+            # board in a single contiguous array instead of a list of
+            # Cell objects shrinks the working set dramatically and lets
+            # the rules run over raw memory instead of Python objects
+            self.grid = np.zeros((height, width), dtype=np.uint8)
+
+            # 3x3 box kernel minus the center: convolving with it yields
+            # the live-neighbor count of every cell in one call
+            self._kernel = np.ones((3, 3), dtype=np.uint8)
+            self._kernel[1, 1] = 0
+
+            # Second buffer for the JIT step: each generation is written
+            # into _next and the two arrays are swapped, so no per-step
+            # allocation happens in the hot loop
+            self._next = np.empty_like(self.grid)
+
+            # Scratch grid with a permanent 1-cell dead border: the
+            # step copies the grid into its interior, so neighbors
+            # never need bounds clamping and the border is paid for
+            # once here instead of every tick
+            self._padded = np.zeros((height + 2, width + 2),
+                                    dtype=np.uint8)
+
+            # Last two generations, for still-life and period-2
+            # oscillator detection in run()
+            self._prev1 = None
+            self._prev2 = None
+
+            # Below this live-cell density the step visits only live
+            # cells and their neighborhoods instead of the whole grid.
+            # Only consulted when neither numba nor scipy is present:
+            # the compiled kernels beat the Python-level sparse walk
+            # by orders of magnitude at any density, so it is strictly
+            # a fallback over the shifted-slice path on near-empty
+            # boards
+            self.sparse_threshold = 0.02
+
+            # What is currently on screen, so draw() can overwrite in
+            # place and redraw only the cells that changed
+            self._last_grid = None
+
+            # Number of worker processes to step with; None keeps the
+            # single-process paths. Only worth it for large grids,
+            # where each band amortizes the per-tick pool dispatch
+            self.processes = processes
+            self._pool = None
+            self._shm = None
+
+            # Toroidal boundary: edges wrap around instead of being
+            # dead, the standard setup for benchmark runs. Steps
+            # through the np.roll path, which has no edge cases at all
+            self.wrap = wrap
+
+    # horizontal bars by width, shared across boards: built once, not
+    # once per frame
+    _bar_cache = {}
 
-        # Draw board
-        for i in range(self.height):
-            for j in range(self.width):
-                ret_s += '|'
-                ret_s += str(self.board[i][j])
-            ret_s += '|\n'
-            for j in range(self.width):
-                ret_s += '--'
-            ret_s += '\n' 
+    def __repr__(self):
+        bar = Board._bar_cache.get(self.width)
+        if bar is None:
+            bar = '--' * self.width
+            Board._bar_cache[self.width] = bar
 
-        # last char is always '\n'. We may not want this
-        return ret_s[:-1]
+        chars = _CELL_CHARS[self.grid]
+        lines = [bar]
+        for row in chars:
+            lines.append('|' + '|'.join(row) + '|')
+            lines.append(bar)
+        return '\n'.join(lines)
 
 
     def make_random_board(self, p=0.50):
         ''' Given an optional percent coverage of cells, randomly
             place cells onto board '''
-        for i in range(self.width):
-            for j in range(self.height):
-                r = random.random()
-                if r < p:
-                    b.set_cell(Cell(i, j, alive=True))
+        self.grid = (np.random.random((self.height, self.width)) < p) \
+                        .astype(np.uint8)
 
     def draw(self):
-        ''' Prints Board to stdout '''
-        print(self.__repr__() + "\n\n")
-    
+        ''' Prints Board to stdout. The first frame clears the screen
+            and draws everything; later frames home the cursor and
+            overwrite in place, and when only a few cells changed just
+            those are readdressed individually, so tty traffic scales
+            with the activity on the board rather than its size '''
+        if self._last_grid is None \
+                or self._last_grid.shape != self.grid.shape:
+            sys.stdout.write('\x1b[2J\x1b[H' + self.__repr__() + "\n\n\n")
+            self._last_grid = self.grid.copy()
+            sys.stdout.flush()
+            return
+
+        changes = np.argwhere(self.grid != self._last_grid)
+        if len(changes) * 10 < self.grid.size:
+            # grid row y sits on screen line 2y+2 (bars in between) and
+            # cell x in column 2x+2; park the cursor below the board
+            # when done
+            out = []
+            for y, x in changes:
+                out.append('\x1b[%d;%dH%s' % (2 * y + 2, 2 * x + 2,
+                                              _CELL_CHARS[self.grid[y, x]]))
+            out.append('\x1b[%d;1H' % (2 * self.height + 4))
+            sys.stdout.write(''.join(out))
+        else:
+            sys.stdout.write('\x1b[H' + self.__repr__() + "\n\n\n")
+
+        self._last_grid[:] = self.grid
+        sys.stdout.flush()
+
     def set_cell(self, cell):
         ''' Place a cell at Cell point 'cell' in the board '''
-        self.board[cell.y][cell.x] = cell
-
-    def get_living_neighbors(self, cell):
-        ''' returns list of type Cell that 
-        holds the neighbors of the given cell '''
-        ret_l = []
-
-        for y in range(cell.y - 1, cell.y + 2):
-            for x in range(cell.x - 1, cell.x + 2):
-                if x < self.width and x >= 0 and y < self.height and y >= 0: 
-                    c = self.board[y][x]
-                    if c.alive and c != cell:
-                        ret_l.append(c)
-        return ret_l
-
-    def check_rules(self, cell):
-        ''' Applies rules for Conway's Game of Life to the given cell '''
-        neighbors_l = self.get_living_neighbors(cell)
-        num_neighbors = len(neighbors_l)
-
-        # 1. Any live cell with fewer than two live neighbours dies, 
+        self.grid[cell.y, cell.x] = 1 if cell.alive else 0
+
+    def count_living_neighbors(self, cell):
+        ''' returns how many of the 8 neighbors of the given cell are
+        alive. The center is skipped by its offset, not by comparing
+        cells, and no intermediate list is built '''
+        count = 0
+
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if dy == 0 and dx == 0:
+                    continue
+                y = cell.y + dy
+                x = cell.x + dx
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    count += self.grid[y, x]
+        return int(count)
+
+    def step(self):
+        ''' Advances the board by one generation, applying the rules of
+            Conway's Game of Life to every cell at once '''
+        if self.wrap:
+            self._step_wrap()
+            return
+
+        if self.processes and self.processes > 1:
+            self._step_mp()
+            return
+
+        if numba is None and ndimage is None and self.grid.size:
+            num_live = np.count_nonzero(self.grid)
+            if num_live / self.grid.size < self.sparse_threshold:
+                self._step_sparse()
+                return
+
+        if numba is not None:
+            self._padded[1:-1, 1:-1] = self.grid
+            _step_jit(self._padded, self._next, _RULE_LUT)
+            self.grid, self._next = self._next, self.grid
+            return
+
+        n = self._count_neighbors()
+
+        # 1. Any live cell with fewer than two live neighbours dies,
         #    as if caused by underpopulation.
-        # 2. Any live cell with two or three live neighbours lives 
+        # 2. Any live cell with two or three live neighbours lives
         #    on to the next generation.
-        if (num_neighbors < 2):
-            # self.board[cell.y][cell.x].alive = False
-            self.board[cell.y][cell.x].alive = False
-            if debug:
-                print("CELL:", cell.x, cell.y, "Will DIE")
-                print("Neighbors:")
-                for c in neighbors_l:
-                    print("    ", c.x, c.y) 
-
-
-        # 3. Any live cell with more than three live neighbours dies, 
+        # 3. Any live cell with more than three live neighbours dies,
         #    as if by overpopulation.
-        elif (num_neighbors > 3):
-            # self.board[cell.y][cell.x].alive = False
-            #self.board[cell.y][cell.x].will_die = True
-            self.board[cell.y][cell.x].alive = False
-            if debug:
-                print("CELL:", cell.x, cell.y, "Will DIE")
-                print("Neighbors:")
-                for c in neighbors_l:
-                    print("    ", c.x, c.y) 
-
-        # 4. Any dead cell with exactly three live neighbours 
+        # 4. Any dead cell with exactly three live neighbours
         #    becomes a live cell, as if by reproduction.
-        elif (num_neighbors) == 3:
-            # self.board[cell.y][cell.x].alive = True
-            #self.board[cell.y][cell.x].will_revive = True
-            self.board[cell.y][cell.x].alive = True
-            if debug:
-                print("CELL:", cell.x, cell.y, "Will REVIVE")
-                print("Neighbors:")
-                for c in neighbors_l:
-                    print("    ", c.x, c.y) 
-
-    def run(self, delay=2):
+        self.grid = ((n == 3) | ((self.grid == 1) & (n == 2))) \
+                        .astype(np.uint8)
+
+    def _step_wrap(self):
+        ''' One generation with periodic boundary conditions: each of
+            the 8 neighbor counts is a whole-grid np.roll, so edge
+            cells see the opposite side and every cell costs the same,
+            with no padding or bounds branches '''
+        n = sum(np.roll(self.grid, (dy, dx), axis=(0, 1))
+                for dy, dx in _OFFSETS_8)
+        self.grid = ((n == 3) | ((self.grid == 1) & (n == 2))) \
+                        .astype(np.uint8)
+
+    def _step_sparse(self):
+        ''' One generation visiting only live cells and their
+            neighborhoods. A dead cell with an all-dead neighborhood
+            stays dead, so on a mostly-empty board only the cells in
+            the 3x3 halo around each live cell can change: the step is
+            O(live * 9) instead of O(width * height) '''
+        h = self.height
+        w = self.width
+
+        live = set(zip(*np.nonzero(self.grid)))
+
+        candidates = set()
+        for (y, x) in live:
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    ny = y + dy
+                    nx = x + dx
+                    if 0 <= ny < h and 0 <= nx < w:
+                        candidates.add((ny, nx))
+
+        new_live = set()
+        for (y, x) in candidates:
+            n = 0
+            for dy in (-1, 0, 1):
+                for dx in (-1, 0, 1):
+                    if dy == 0 and dx == 0:
+                        continue
+                    if (y + dy, x + dx) in live:
+                        n += 1
+            if n == 3 or (n == 2 and (y, x) in live):
+                new_live.add((y, x))
+
+        self.grid[:] = 0
+        for (y, x) in new_live:
+            self.grid[y, x] = 1
+
+    def run_gpu(self, steps, check_every=64):
+        ''' Advances the board the given number of generations on the
+            GPU. The grid is uploaded once and two device buffers
+            ping-pong between generations; the host only looks at the
+            state every check_every generations to stop early on a
+            fixed point. Worth it for boards of a million cells and
+            up. Requires cupy and a CUDA device '''
+        if cupy is None:
+            raise RuntimeError("run_gpu requires cupy")
+        if steps < 0:
+            raise ValueError("steps cannot be negative")
+
+        h = np.int32(self.height)
+        w = np.int32(self.width)
+        blocks = ((self.width + 15) // 16, (self.height + 15) // 16)
+
+        src = cupy.asarray(self.grid)
+        dst = cupy.empty_like(src)
+
+        done = 0
+        while done < steps:
+            chunk = min(check_every, steps - done)
+            snapshot = src.copy()
+            for _ in range(chunk):
+                _gpu_step(blocks, (16, 16), (src, dst, h, w))
+                src, dst = dst, src
+            done += chunk
+            if bool(cupy.array_equal(src, snapshot)):
+                break
+
+        self.grid[:] = cupy.asnumpy(src)
+
+    def _step_mp(self):
+        ''' One generation computed by a pool of workers, each owning a
+            band of rows. The grid is copied into shared memory, every
+            worker writes its band of the next generation there, and
+            the result is copied back '''
+        if self._pool is None:
+            self._start_pool()
+
+        self._views[self._mp_flip][:] = self.grid
+
+        band = -(-self.height // self.processes)
+        self._pool.map(_mp_step_band,
+                       [(y0, min(y0 + band, self.height), self._mp_flip)
+                        for y0 in range(0, self.height, band)])
+
+        self._mp_flip ^= 1
+        self.grid[:] = self._views[self._mp_flip]
+
+    def _start_pool(self):
+        ''' Allocates the two shared generation buffers and starts the
+            worker pool attached to them. The pool is spawned, not
+            forked: the eagerly compiled parallel kernel initializes
+            numba's native threading runtime at import, and forking a
+            process that holds it hangs the interpreter at exit.
+            Workers attach the buffers by name, so spawn needs nothing
+            from the parent's memory '''
+        nbytes = max(self.grid.nbytes, 1)
+        self._shm = [shared_memory.SharedMemory(create=True, size=nbytes)
+                     for _ in range(2)]
+        self._views = [np.ndarray(self.grid.shape, dtype=np.uint8,
+                                  buffer=s.buf)
+                       for s in self._shm]
+        self._mp_flip = 0
+        self._pool = multiprocessing.get_context('spawn').Pool(
+            self.processes,
+            initializer=_mp_init,
+            initargs=(self._shm[0].name, self._shm[1].name,
+                      self.grid.shape))
+
+    def close(self):
+        ''' Shuts down the worker pool and releases the shared
+            buffers. Only needed after stepping with processes set '''
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._shm is not None:
+            self._views = None
+            for s in self._shm:
+                s.close()
+                s.unlink()
+            self._shm = None
+
+    def run_hashlife(self, steps):
+        ''' Advances the board the given number of generations with
+            HashLife. Worthwhile for long horizons on large boards:
+            memoization gives repetitive patterns an exponential
+            speedup over stepping one generation at a time.
+
+            Note: HashLife simulates an unbounded plane, while step()
+            kills everything at the board edge, so the two can diverge
+            once a pattern reaches the border. Anything that escapes
+            the board is clipped when the result is copied back '''
+        if steps < 0:
+            raise ValueError("steps cannot be negative")
+        if steps == 0:
+            return
+
+        node = _hl_from_grid(self.grid)
+
+        # (off_y, off_x): where the board's origin sits in node coords
+        off_y = 0
+        off_x = 0
+
+        # advance by each power of two in steps, highest first
+        for j in reversed(range(steps.bit_length())):
+            if not (steps >> j) & 1:
+                continue
+
+            # pad until the node is deep enough for a 2^j advance and
+            # all live cells are safely inside its center quarter
+            while node.level < max(3, j + 2) or not _hl_is_padded(node):
+                off_y += 1 << (node.level - 1)
+                off_x += 1 << (node.level - 1)
+                node = _hl_centre(node)
+
+            # successor returns the center half: origin moves in by a
+            # quarter of the old node size
+            quarter = 1 << (node.level - 2)
+            node = _hl_successor(node, j)
+            off_y -= quarter
+            off_x -= quarter
+
+        self.grid[:] = 0
+        _hl_to_grid(node, self.grid, -off_y, -off_x)
+
+    def step_packed(self, generations=1):
+        ''' Advances the board using the bit-packed SWAR kernel: the
+            grid is packed to 1 bit per cell (64 cells per uint64 word),
+            stepped the given number of generations, then unpacked.
+            Cuts memory traffic 8x vs. the uint8 grid, so it pays off
+            when running many generations at once. Requires numba '''
+        if numba is None:
+            raise RuntimeError("step_packed requires numba")
+
+        packed = self._pack()
+        out = np.empty_like(packed)
+
+        rem = self.width & 63
+        last_mask = np.uint64((1 << rem) - 1 if rem else 2 ** 64 - 1)
+
+        for _ in range(generations):
+            _step_swar(packed, out, last_mask)
+            packed, out = out, packed
+
+        self._unpack(packed)
+
+    def _pack(self):
+        ''' Returns the grid packed to 1 bit per cell, LSB-first '''
+        words = (self.width + 63) // 64
+        packed = np.zeros((self.height, words), dtype=np.uint64)
+        bits = self.grid.astype(np.uint64)
+        for x in range(self.width):
+            packed[:, x >> 6] |= bits[:, x] << np.uint64(x & 63)
+        return packed
+
+    def _unpack(self, packed):
+        ''' Writes a bit-packed grid back into the uint8 grid '''
+        one = np.uint64(1)
+        for x in range(self.width):
+            self.grid[:, x] = (packed[:, x >> 6] >> np.uint64(x & 63)) & one
+
+    def _count_neighbors(self):
+        ''' Returns an array holding each cell's live-neighbor count '''
+        h = self.height
+        w = self.width
+
+        if ndimage is not None:
+            # One fused C pass: a 3x3 convolution with the center zeroed
+            # is exactly the 8-neighbor sum, with a dead border
+            return ndimage.convolve(self.grid, self._kernel,
+                                    mode='constant', cval=0,
+                                    output=np.uint8)
+
+        # Fallback without scipy: use the padded scratch grid so every
+        # cell has 8 in-bounds neighbors, then sum the 8 shifted views
+        self._padded[1:-1, 1:-1] = self.grid
+        padded = self._padded
+
+        return sum(padded[dy:dy + h, dx:dx + w]
+                   for dy in range(3)
+                   for dx in range(3)
+                   if (dy, dx) != (1, 1))
+
+    def run(self, delay=2, steps_per_frame=1):
         ''' After creating board, begin simulation.
             Runs until there is no movement from 1 frame to the next.
-            (May run forever!)'''
-        sleep(delay)
-        while True:
-
-            # md5sum used to determine if there is any change from the
-            # previous frame. If no change, exit
-            old_hash = hashlib.md5(self.__repr__().encode("utf-8"))
+            (May run forever!)
 
-            # scan board, and determine who lives and who dies
-            for y in range(self.height):
-                for x in range(self.width): 
-                    cell = self.board[y][x]
-                    self.check_rules(cell)
+            steps_per_frame generations are computed between renders:
+            once the step itself is vectorized the terminal write is
+            the dominant cost, so batching keeps the run bound by
+            simulation work rather than drawing '''
+        self._prev1 = None
+        self._prev2 = None
 
-            # apply rules to the board
-            for y in range(self.height):
-                for x in range(self.width): 
-                    cell = self.board[y][x]
-
-                    if cell.will_revive:
-                        self.board[y][x].revive()
+        sleep(delay)
+        while True:
 
-                    elif cell.will_die:
-                        self.board[y][x].kill()
+            # advance the board, only rendering the last generation
+            for _ in range(steps_per_frame):
+                self.step()
 
             self.draw()
 
-            new_hash = hashlib.md5(self.__repr__().encode("utf-8"))
-            if old_hash.hexdigest() == new_hash.hexdigest():
+            # compare against the last two rendered states: equal to
+            # the previous one means a still life (or a cycle dividing
+            # the batch size), equal to the one before that catches
+            # period-2 oscillators such as blinkers, which would
+            # otherwise flip forever
+            if self._prev1 is not None \
+                    and np.array_equal(self.grid, self._prev1):
                 print("Simulation complete: no more movement possible")
                 break
 
+            if self._prev2 is not None \
+                    and np.array_equal(self.grid, self._prev2):
+                print("Simulation complete: board oscillates with period 2")
+                break
+
+            self._prev2 = self._prev1
+            self._prev1 = self.grid.copy()
+
             sleep(delay)
 
 
@@ -251,38 +942,39 @@ def test():
     c1 = Cell(2,3, True)
     B.set_cell(c1)
 
-    neighbors_l = B.get_living_neighbors(c1)
-    for c in neighbors_l:
-        print(c.x, c.y)
+    print(B.count_living_neighbors(c1))
     print(B)
 
     B.run()
 
 # Main
-# x = 80
-# y = 50
-
-# set x and y to the size of the console (UNIX only)
-
-x, y = os.popen("stty size", 'r').read().split()
-x = int(x)
-y = int(y) // 8
+def main():
+    # set x and y to the size of the console (UNIX only); fall back to
+    # a standard terminal anywhere stty is unavailable
+    try:
+        x, y = os.popen("stty size", 'r').read().split()
+        x = int(x)
+        y = int(y) // 8
+    except (OSError, ValueError):
+        x, y = 80, 24
 
-if len(sys.argv) > 1:
-    p = float(sys.argv[1]) / 100
-else:
-    p = 0.75 # percent coverage of cells
+    if len(sys.argv) > 1:
+        p = float(sys.argv[1]) / 100
+    else:
+        p = 0.75 # percent coverage of cells
 
-b = Board(x, y)
+    b = Board(x, y)
 
-print("Dimensions:", x, y)
-print("Percent Coverage:", str(p * 100) + "%")
-input("Press RETURN to start simulation")
+    print("Dimensions:", x, y)
+    print("Percent Coverage:", str(p * 100) + "%")
+    input("Press RETURN to start simulation")
 
-b.make_random_board(p)
+    b.make_random_board(p)
 
-print("Start:")
-b.draw()
+    print("Start:")
+    b.draw()
 
-b.run()
+    b.run()
 
+if __name__ == '__main__':
+    main()